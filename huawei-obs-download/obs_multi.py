@@ -3,33 +3,115 @@
 
 from __future__ import print_function
 
+# monkey patch必须先于一切import执行(gevent文档要求),
+# 否则SDK拿到的socket/ssl是阻塞版本, 协程并发会退化成串行.
+from gevent import monkey
+monkey.patch_all()
+
+import atexit
 import hashlib
+import json
 import logging
+import logging.handlers
+import multiprocessing
 import optparse
 import os
 import shutil
-import time
 
 import gevent
+import gevent.pool
+import gevent.queue
 from com.huawei.obs.client.obs_client import ObsClient
 
 from conf import ACCESS_KEY, SECRET_KEY, download_storage_path
 
 logs_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
 
+_md5_pool = None  # 校验进程池, 懒创建.
+
+
+def _get_md5_pool():
+    """懒创建校验进程池, 无校验需求时不产生进程开销."""
+
+    global _md5_pool
+    if _md5_pool is None:
+        _md5_pool = multiprocessing.Pool(multiprocessing.cpu_count())
+    return _md5_pool
+
+
+def _verify_one(path_etag):
+    """进程池工作函数, 校验单个本地文件与ETAG是否一致.
+
+        :param path_etag: (本地文件路径, 对象校验码)
+    """
+
+    path, etag = path_etag
+    return path, Utils.verify_local(path, etag)
+
 
 class Utils(object):
     """封装函数库.
     """
 
+    # 流式读取块大小, 1MiB.
+    READ_BLOCK_SIZE = 1 << 20
+
     @staticmethod
     def md5sum(filename):
-        with open(filename, "r") as f:
-            fmd5 = hashlib.md5(f.read())
+        # 分块流式计算, 避免大对象整体读入内存.
+        with open(filename, "rb") as f:
+            fmd5 = hashlib.md5()
+            for chunk in iter(lambda: f.read(Utils.READ_BLOCK_SIZE), b''):
+                fmd5.update(chunk)
             # 因OBS返回的ETAG特殊, 故在此格式化处理.
             etag = '"%s"' % fmd5.hexdigest()
             return etag
 
+    @staticmethod
+    def sha256sum(filename):
+        # 新CPU带SHA扩展指令, SHA-256比MD5核心循环更快.
+        with open(filename, "rb") as f:
+            fsha = hashlib.sha256()
+            for chunk in iter(lambda: f.read(Utils.READ_BLOCK_SIZE), b''):
+                fsha.update(chunk)
+            return fsha.hexdigest()
+
+    @staticmethod
+    def verify_local(filename, etag):
+        """校验本地文件, 优先sidecar的SHA-256, 缺失才退回MD5/ETAG.
+
+            :param filename: 本地文件路径
+            :param etag: 对象校验码
+        """
+
+        sidecar = filename + '.sha256'
+        if os.path.exists(sidecar):
+            with open(sidecar, 'rb') as f:
+                expected = f.read().strip()
+            return Utils.sha256sum(filename) == expected
+        return Utils.md5sum(filename) == etag
+
+    # 已创建目录缓存, 同目录只makedirs一次.
+    _ensured_dirs = set()
+
+    @staticmethod
+    def ensure_dir(path):
+        """目录不存在则创建, 结果缓存省掉每对象一次的stat系统调用.
+
+            :param path: 目录路径
+        """
+
+        if path in Utils._ensured_dirs:
+            return
+
+        try:
+            os.makedirs(path)
+        except OSError:
+            # 目录已存在(含并发协程抢先建好)时忽略.
+            if not os.path.isdir(path):
+                raise
+        Utils._ensured_dirs.add(path)
+
     @staticmethod
     def build_file_logs(logger_name, log_path=None, level=logging.INFO):
         """创建文件日志.
@@ -49,9 +131,14 @@ class Utils(object):
         fh = logging.FileHandler(log_path)
         fh.setFormatter(formatter)
 
+        # 内存缓冲攒1024条(或遇ERROR)才落盘, 热循环里免每条一次写盘.
+        mem = logging.handlers.MemoryHandler(
+            1024, flushLevel=logging.ERROR, target=fh)
+        atexit.register(mem.flush)
+
         logger = logging.getLogger(logger_name)
         logger.setLevel(level)
-        logger.addHandler(fh)
+        logger.addHandler(mem)
 
         return logger
 
@@ -78,7 +165,8 @@ class HuaWeiDownLoad(object):
     def _set_progress_bucket(self):
         if os.path.exists(self._download_bucket):
             with open(self._download_bucket, 'rb') as f:
-                bucket = f.readline()
+                # 二进制读不做换行翻译, 自行剥掉可能的CR/LF.
+                bucket = f.readline().strip()
                 if bucket:
                     self._next_bucket = bucket
                 else:
@@ -89,7 +177,7 @@ class HuaWeiDownLoad(object):
         """
 
         response = self._connect.listBuckets()
-        return [item.__dict__['name'] for item in response.body.buckets]
+        return [item.name for item in response.body.buckets]
 
     def get_all_bucket_info(self):
         """查看所有bucket信息, 用于核实数据及下载前磁盘空间规划.
@@ -100,12 +188,11 @@ class HuaWeiDownLoad(object):
 
         # 1G = 1024**3 bytes
         for bucket in buckets:
-            response = self._connect.getBucketStorageInfo(bucket)
-            self._print("%s : %s" % (bucket, response.body.__dict__))
+            body = self._connect.getBucketStorageInfo(bucket).body
+            self._print("%s : %s" % (bucket, body.__dict__))
 
-            total_info['sizes'] += int(response.body.__dict__['size'])
-            total_info['objectNumbers'] += int(
-                response.body.__dict__['objectNumber'])
+            total_info['sizes'] += int(body.size)
+            total_info['objectNumbers'] += int(body.objectNumber)
 
         total_info['human_sizes'] = ''.join(
             (str(float(total_info['sizes']) / 1024 ** 3), 'G'))
@@ -124,18 +211,19 @@ class HuaWeiDownLoad(object):
                 self._print(
                     "%s%s%s" % ("*" * 40, "All Bucket Is Starting.", "*" * 40))
 
-            for bucket in buckets:
-                # 跳过已执行bucket.
-                if self._next_bucket and bucket != self._next_bucket:
-                    continue
+            # 直接定位续传bucket, 不再逐个比较跳过.
+            start = buckets.index(self._next_bucket) \
+                if self._next_bucket in buckets else 0
 
+            for bucket in buckets[start:]:
                 # 记录执行bucket位置.
                 self._next_bucket = bucket
                 with open(self._download_bucket, 'wb') as f:
                     f.write('%s' % self._next_bucket)
 
                 hua_wei = HuaWeiBucket(bucket, max_keys=500,
-                                       download_path=download_path)
+                                       download_path=download_path,
+                                       connect=self._connect)
                 hua_wei.download_all_object()
 
             self._print(
@@ -143,21 +231,31 @@ class HuaWeiDownLoad(object):
 
 
 class HuaWeiBucket(object):
+    # 失败对象重试轮数上限, 首轮静默秒数及间隔上限.
+    MAX_RETRIES = 5
+    RETRY_BACKOFF = 60
+    MAX_RETRY_BACKOFF = 600
+
     def __init__(self, bucket_name, max_keys=0, download_path=None,
-                 debug=False):
+                 pool_size=32, connect=None, debug=False):
         """下载桶构建.
 
             :param bucket_name: 桶名
             :param max_keys: 请求返回数量
             :param download_path: 下载存放目录
+            :param pool_size: 并发下载协程数上限
+            :param connect: 可复用的ObsClient, 缺省时自建
             :param debug: 是否调试模式, 开发者自用
         """
 
-        self._connect = ObsClient(ACCESS_KEY, SECRET_KEY, False)
+        # 复用传入的client, 省掉每桶一次的TLS握手/DNS解析.
+        self._connect = connect if connect else ObsClient(
+            ACCESS_KEY, SECRET_KEY, False)
         self._download_path = download_path
         self._bucket_name = bucket_name
 
         self._max_keys = max_keys
+        self._pool_size = pool_size
         self._is_truncated = True
         self._next_marker = None  # 当前执行paging位置
 
@@ -174,15 +272,55 @@ class HuaWeiBucket(object):
         self._download_failure = os.path.join(
             bucket_logs, 'download_failure.txt')
 
+        self._verify_cache = {}  # 并行校验结果, 路径 -> 是否一致.
+
+        self._manifest_path = os.path.join(
+            bucket_logs, 'download_manifest.tsv')
+        self._manifest = self._load_manifest()
+
         self._set_progress_marker()
 
+    def _load_manifest(self):
+        """加载已下载清单, 对象键 -> 校验码.
+
+            清单命中的对象续传时一次dict查询即跳过, 免stat免hash.
+        """
+
+        manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or '\t' not in line:
+                        continue
+
+                    # 键里可能有'\t', 从右切保住etag.
+                    key, _, etag = line.rpartition('\t')
+                    manifest[key] = etag
+        return manifest
+
+    def _record_manifest(self, object_key, etag):
+        """校验通过的对象追加进清单.
+
+            :param object_key: 对象键
+            :param etag: 对象校验码
+        """
+
+        if not etag or self._manifest.get(object_key) == etag:
+            return
+
+        self._manifest[object_key] = etag
+        with open(self._manifest_path, 'ab') as f:
+            f.write('%s\t%s\n' % (object_key, etag))
+
     def _set_progress_marker(self):
         """对翻页和桶的进度设置.
         """
 
         if os.path.exists(self._download_marker):
             with open(self._download_marker, 'rb') as f:
-                marker = f.readline()
+                # 二进制读不做换行翻译, 自行剥掉可能的CR/LF.
+                marker = f.readline().strip()
                 record = marker.split(':') if marker else None
                 if record:
                     self._is_truncated = bool(record[0])
@@ -204,26 +342,60 @@ class HuaWeiBucket(object):
         except Exception as ex:
             self._print("listObject ==> %s" % ex)
         else:
-            self._is_truncated = response.body.__dict__['is_truncated']
-            self._next_marker = response.body.__dict__['next_marker']
+            body = response.body
+            self._is_truncated = body.is_truncated
+            self._next_marker = body.next_marker
 
             if self._is_truncated:
                 with open(self._download_marker, 'wb') as f:
                     f.write('%s:%s' % (self._is_truncated, self._next_marker))
 
-            object_keys = [(item.__dict__['etag'], item.__dict__['key']) for
-                           item in response.body.contents]
+            object_keys = [(item.etag, item.key) for
+                           item in body.contents]
 
         return object_keys
 
-    def _log_download_failure(self, info):
+    def _log_download_failure(self, object_md5_key):
         """记录下载失败的对象.
 
-            :param info: 信息(下载失败的key)
+            :param object_md5_key: (对象校验码, 对象键)
         """
 
+        # JSON行存储, 对象键里合法的':'不会破坏格式.
         with open(self._download_failure, 'ab') as f:
-            f.write('%s\n' % info)
+            f.write('%s\n' % json.dumps(list(object_md5_key)))
+
+    def _batch_verify(self, object_md5_keys, bucket_path):
+        """并行校验已存在的本地文件, 结果缓存供跳过判断使用.
+
+            多核同时跑MD5, 把计算挪出gevent循环(单核).
+
+            :param object_md5_keys: [(对象校验码, 对象键), ...]
+            :param bucket_path: 桶路径
+        """
+
+        pairs = []
+        for item in object_md5_keys:
+            if not isinstance(item, tuple):
+                continue
+
+            etag, object_key = item
+            if not os.path.basename(object_key):
+                continue
+
+            # 清单已确认的对象无需再hash.
+            if self._manifest.get(object_key) == etag:
+                continue
+
+            object_path = os.path.join(bucket_path, *object_key.split('/'))
+            if os.path.exists(object_path):
+                pairs.append((object_path, etag))
+
+        if pairs:
+            results = _get_md5_pool().imap_unordered(
+                _verify_one, pairs, chunksize=16)
+            for path, matched in results:
+                self._verify_cache[path] = matched
 
     def _check_object_and_catalog(self, object_md5_key, bucket_path=None):
         """检测目录和对象是否存在.
@@ -240,26 +412,31 @@ class HuaWeiBucket(object):
         # 每桶成独立目录.
         bucket_base_path = bucket_path if bucket_path else self._download_path
 
-        # 如key只是个目录 or 文件已存在则直接跳过.
-        if not os.path.basename(object_key):
+        # 一次切分同时得到对象路径和目录路径, 不再dirname后二次切分.
+        parts = object_key.split('/')
+
+        # 如key只是个目录则直接跳过.
+        if not parts[-1]:
             return 2
 
-        # 如目录则构建存放路径.
-        if '/' in object_key:
-            object_path = os.path.join(
-                bucket_base_path, *object_key.split('/'))
-            down_load_path = os.path.join(
-                bucket_base_path, *os.path.dirname(object_key).split('/'))
-        else:
-            object_path = os.path.join(bucket_base_path, object_key)
-            down_load_path = bucket_base_path
+        # 清单命中: 一次dict查询即跳过, 免stat免hash.
+        if etag and self._manifest.get(object_key) == etag:
+            return 1
+
+        object_path = os.path.join(bucket_base_path, *parts)
+        down_load_path = os.path.join(bucket_base_path, *parts[:-1]) \
+            if len(parts) > 1 else bucket_base_path
 
-        if os.path.exists(object_path) and Utils.md5sum(object_path) == etag:
+        # 优先取并行校验的缓存结果, 无缓存时才同步计算.
+        verified = self._verify_cache.pop(object_path, None)
+        if verified is None and os.path.exists(object_path):
+            verified = Utils.verify_local(object_path, etag)
+        if verified:
+            self._record_manifest(object_key, etag)
             return 1
 
         # 目录如不存在则创建.
-        if not os.path.exists(down_load_path):
-            os.makedirs(down_load_path)
+        Utils.ensure_dir(down_load_path)
 
         return down_load_path
 
@@ -284,8 +461,29 @@ class HuaWeiBucket(object):
             # Fixed:// TypeError: decoding Unicode is not supported.
             if isinstance(object_key, unicode):
                 object_key = u'%s' % object_key.encode("UTF-8")
-            self._connect.getObject(
-                self._bucket_name, object_key, down_load_path)
+
+            response = self._connect.getObject(
+                self._bucket_name, object_key)
+
+            object_path = os.path.join(
+                down_load_path, os.path.basename(object_key))
+            fmd5 = hashlib.md5()
+            fsha = hashlib.sha256()
+
+            # 边下边算: HTTP流一次过盘, 不再下载后重读整个文件做校验.
+            # 写句柄带1MiB用户态缓冲, 小对象的零散写合并为整块下盘.
+            stream = response.body.response
+            try:
+                with open(object_path, 'wb', Utils.READ_BLOCK_SIZE) as f:
+                    while True:
+                        chunk = stream.read(Utils.READ_BLOCK_SIZE)
+                        if not chunk:
+                            break
+                        fmd5.update(chunk)
+                        fsha.update(chunk)
+                        f.write(chunk)
+            finally:
+                stream.close()
         except Exception as ex:
             self._print("getObject ==> %s" % ex)
             if self._debug:
@@ -294,12 +492,16 @@ class HuaWeiBucket(object):
             return 0
         else:
             # 校验文件下载正确性.
-            base_name = os.path.basename(object_key)
             if etag:
-                return int(Utils.md5sum(
-                    os.path.join(down_load_path, base_name)) == etag)
-            else:
-                return 1
+                if '"%s"' % fmd5.hexdigest() != etag:
+                    return 0
+
+                # 落SHA-256 sidecar, 续传跳过检查时走SHA快路径.
+                with open(object_path + '.sha256', 'wb') as f:
+                    f.write(fsha.hexdigest())
+
+                self._record_manifest(object_key, etag)
+            return 1
 
     def download_all_object(self):
         """获得所有对象保存到本地.
@@ -307,10 +509,8 @@ class HuaWeiBucket(object):
 
         # 每桶每目录, 如不存在则创建.
         bucket_path = os.path.join(self._download_path, self._bucket_name)
-        if not os.path.exists(bucket_path):
-            os.makedirs(bucket_path)
+        Utils.ensure_dir(bucket_path)
 
-        i = 0 if self._debug else None
         info = 'Debug is done.' if self._debug else 'work is done.'
 
         def pack_download(_item, _bucket_path):
@@ -320,27 +520,50 @@ class HuaWeiBucket(object):
             _result = self.download_object(_item, bucket_path=_bucket_path)
             if not _result:
                 self._print("DownloadFailure ==> %s" % str(_item))
-                self._log_download_failure('%s:%s' % _item)
+                self._log_download_failure(_item)
             else:
                 self._print("DownLoad ==> %s" % str(_item))
 
-        while self._is_truncated:
-            keys = self._get_all_object()
-            if keys:
-                tasks = [gevent.spawn(pack_download, item, bucket_path) for
-                         item in keys]
-                gevent.joinall(tasks)
+        # 翻页预取: 生产者后台拉下一页, 消费侧下载当前页, 列表延迟被掩盖.
+        page_queue = gevent.queue.Queue(maxsize=2)
+
+        def listing_producer():
+            """后台逐页拉取object列表.
+            """
 
-            if i is not None:
-                i += 1
-                if i == 5:
-                    break
+            pages = 0
+            while self._is_truncated:
+                keys = self._get_all_object()
+                if keys:
+                    page_queue.put(keys)
+
+                if self._debug:
+                    pages += 1
+                    if pages == 5:
+                        break
+            page_queue.put(None)  # 结束哨兵.
+
+        producer = gevent.spawn(listing_producer)
+
+        # 有界协程池限并发套接字数, 不再为一页500个key各起一个greenlet.
+        pool = gevent.pool.Pool(self._pool_size)
+
+        while True:
+            keys = page_queue.get()
+            if keys is None:
+                break
+
+            self._batch_verify(keys, bucket_path)
+            for item in keys:
+                pool.spawn(pack_download, item, bucket_path)
+            pool.join()
+
+        producer.join()
 
         self._print(
             "%s%s%s" % ("=" * 40, "Download Failure is starting", "=" * 40))
 
         try:
-            # RuntimeError: maximum recursion depth exceeded.
             self.download_failure(bucket_path=bucket_path)
         except Exception as ex:
             self._print(ex)
@@ -356,43 +579,60 @@ class HuaWeiBucket(object):
             :param bucket_path: 桶存储路径
         """
 
-        if os.path.exists(self._download_failure):
-            with open(self._download_failure, 'rb') as f:
-                lines = f.readlines()
-
-            if lines:
-                second_failure = []
-                for i in lines:
-                    i = i.strip().strip('\n')
-                    if not i:
-                        continue
-
-                    i = tuple(i.split(':'))
-                    result = self.download_object(i, bucket_path=bucket_path)
-
-                    # 失败的对象再次下载重试, 因校验码总是失败的情况.
-                    if not result:
-                        result = self.download_object(
-                            i[-1], bucket_path=bucket_path)
-
-                    if not result:
-                        self._print("DownloadFailure ==> %s" % str(i))
-                        second_failure.append(i)
-                    else:
-                        self._print("DownLoad ==> %s" % str(i[-1]))
-
-                os.remove(self._download_failure)
-                if second_failure:
-                    with open(self._download_failure, 'ab') as f:
-                        for i in second_failure:
-                            if i:
-                                f.write('%s:%s\n' % i)
+        if not os.path.exists(self._download_failure):
+            return
+
+        with open(self._download_failure, 'rb') as f:
+            lines = f.readlines()
+
+        failures = []
+        for i in lines:
+            i = i.strip()
+            if not i:
+                continue
+
+            try:
+                record = json.loads(i)
+                failures.append(tuple(record))
+            except ValueError:
+                # 兼容旧 'etag:key' 格式, 只切一次以容忍key里的':'.
+                failures.append(tuple(i.split(':', 1)))
+
+        # 迭代有界重试, 取代曾打爆递归深度且每轮重读文件的递归写法.
+        backoff = self.RETRY_BACKOFF
+        for attempt in range(self.MAX_RETRIES):
+            if not failures:
+                break
+
+            if attempt:
+                # 协作式静默再试, 其他greenlet(如翻页预取)继续推进;
+                # 间隔逐轮加倍, 封顶MAX_RETRY_BACKOFF.
+                gevent.sleep(min(backoff, self.MAX_RETRY_BACKOFF))
+                backoff *= 2
+
+            remaining = []
+            for i in failures:
+                result = self.download_object(i, bucket_path=bucket_path)
+
+                # 失败的对象再次下载重试, 因校验码总是失败的情况.
+                if not result:
+                    result = self.download_object(
+                        i[-1], bucket_path=bucket_path)
+
+                if not result:
+                    self._print("DownloadFailure ==> %s" % str(i))
+                    remaining.append(i)
+                else:
+                    self._print("DownLoad ==> %s" % str(i[-1]))
 
-                    # 静默1分钟再对失败对象尝试, 排除时间段内网络异常.
-                    time.sleep(60)
+            failures = remaining
 
-                    # 递归再次处理失败的下载对象.
-                    self.download_failure()
+        # 全部轮次结束后只落一次盘, 留下仍失败的对象.
+        os.remove(self._download_failure)
+        if failures:
+            with open(self._download_failure, 'wb') as f:
+                for i in failures:
+                    f.write('%s\n' % json.dumps(list(i)))
 
     def path_object_mov(self, object_md5_key, bucket_path=None):
         """纠正错误存放路径, 原该放入文件夹但放在桶里.
@@ -445,12 +685,10 @@ class HuaWeiBucket(object):
 
         # 每桶每目录, 如不存在则创建.
         bucket_path = os.path.join(self._download_path, self._bucket_name)
-        if not os.path.exists(bucket_path):
-            os.makedirs(bucket_path)
+        Utils.ensure_dir(bucket_path)
 
         log_bucket = os.path.join(logs_path, self._bucket_name)
-        if not os.path.exists(log_bucket):
-            os.makedirs(log_bucket)
+        Utils.ensure_dir(log_bucket)
 
         corr_failure_path = os.path.join(log_bucket, 'correction_failure.log')
         if os.path.exists(corr_failure_path):
@@ -475,22 +713,19 @@ class HuaWeiBucket(object):
     def unicode_not_supported(self, object_md5_key):
         # 每桶每目录, 如不存在则创建.
         bucket_path = os.path.join(self._download_path, self._bucket_name)
-        if not os.path.exists(bucket_path):
-            os.makedirs(bucket_path)
+        Utils.ensure_dir(bucket_path)
 
         self.download_object(object_md5_key, bucket_path=bucket_path)
 
     def again_failure_supported(self):
         # 每桶每目录, 如不存在则创建.
         bucket_path = os.path.join(self._download_path, self._bucket_name)
-        if not os.path.exists(bucket_path):
-            os.makedirs(bucket_path)
+        Utils.ensure_dir(bucket_path)
 
         self._print(
             "%s%s%s" % ("=" * 40, "Download Failure is starting", "=" * 40))
 
         try:
-            # RuntimeError: maximum recursion depth exceeded.
             self.download_failure(bucket_path=bucket_path)
         except Exception as ex:
             self._print(ex)
@@ -499,6 +734,22 @@ class HuaWeiBucket(object):
             "%s%s%s" % ("=" * 40, "Download Failure is Done.", "=" * 40))
 
 
+def _download_bucket(bucket_path):
+    """进程池工作函数, 下载单个bucket.
+
+        :param bucket_path: (桶名, 下载存放目录)
+    """
+
+    bucket, download_path = bucket_path
+    print("Doing Bucket: %s; SubProcess PID: %s" % (bucket, os.getpid()))
+
+    hua_wei = HuaWeiBucket(
+        bucket,
+        max_keys=500,
+        download_path=download_path)
+    hua_wei.download_all_object()
+
+
 def main():
     """任务执行.
     """
@@ -570,7 +821,7 @@ def minor(mode):
         exit(0)
 
     mode = mode.strip().lower()
-    if mode in ['supervisor', 'perfection']:
+    if mode not in ['supervisor', 'perfection']:
         print('模式错误')
         exit(0)
 
@@ -589,18 +840,13 @@ def minor(mode):
         hua_wei.download_all_object()
 
     elif mode == 'perfection':
-        for bucket in buckets:
-            pid = os.fork()
-            if pid == 0:
-                print("Doing Bucket: %s; SubProcess PID: %s"
-                      % (bucket, os.getpid()))
-
-                hua_wei = HuaWeiBucket(
-                    bucket,
-                    max_keys=500,
-                    download_path=download_path)
-                hua_wei.download_all_object()
-                return
+        # 有界进程池取代无上限fork, 父进程等待全部桶完成再退出.
+        processes = min(len(buckets), multiprocessing.cpu_count() * 2)
+        pool = multiprocessing.Pool(processes)
+        pool.map(_download_bucket,
+                 [(bucket, download_path) for bucket in buckets])
+        pool.close()
+        pool.join()
 
 
 if __name__ == '__main__':